@@ -1,15 +1,60 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+import httpx
 import logging
+import multiprocessing as mp
+import os
+import re
+import threading
+import time
 from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from operator import itemgetter
 from telegram_alert import TelegramAlert, AlertBase
 from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
 from logging_utils import setup_logging
 
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
 setup_logging("option_writer")
 
 ALERT_BUFFER = []
+EXPIRY_FETCH_WORKERS = 4
+TICKER_POOL_SIZE = 4
+# Cap on in-flight Groww requests across all worker processes and threads
+MAX_CONCURRENT_REQUESTS = 6
+
+# Replaced by a shared multiprocessing semaphore in pool workers (see _init_worker)
+REQUEST_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+STRIKE_PRICE = itemgetter("strikePrice")
+
+CACHE_DIR = Path.home() / ".cache" / "option_writer"
+STOCK_META_TTL_SECONDS = 6 * 60 * 60
+# Short-lived expiry page cache for re-runs while developing alert logic; disabled by default
+PAGE_CACHE_DIR = CACHE_DIR / "pages"
+try:
+    PAGE_CACHE_TTL_SECONDS = int(os.getenv("OPTION_WRITER_PAGE_CACHE_TTL", "0"))
+except ValueError:
+    logging.warning("⚠️ Ignoring invalid OPTION_WRITER_PAGE_CACHE_TTL, page cache disabled")
+    PAGE_CACHE_TTL_SECONDS = 0
+
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# HTTP/2 lets concurrent expiry fetches share one multiplexed connection to groww.in
+SESSION = httpx.Client(
+    http2=True,
+    headers=HEADERS,
+    timeout=15,
+    follow_redirects=True,
+    limits=httpx.Limits(max_connections=20),
+)
+
+NEXT_DATA_RE = re.compile(rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.S)
 
 def parse_date(date_str):
     """Parse ISO date safely"""
@@ -17,28 +62,45 @@ def parse_date(date_str):
         return None
     return datetime.fromisoformat(date_str.replace("Z", "")).date()
 
-def flush_alert_buffer_global(alert_manager: AlertBase, alert_buffer: list, max_len: int = 3900):
-    """Send alerts in batches up to `max_len` characters."""
+def load_stock_meta(stock_id):
+    """Load cached stock name, lot size and expiry dates if still fresh"""
+    path = CACHE_DIR / f"{stock_id}.json"
+    try:
+        if time.time() - path.stat().st_mtime > STOCK_META_TTL_SECONDS:
+            return None
+        return _json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+def save_stock_meta(stock_id, meta: dict):
+    """Persist stock metadata so later runs can skip the main page fetch"""
+    data = _json.dumps(meta)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (CACHE_DIR / f"{stock_id}.json").write_bytes(data if isinstance(data, bytes) else data.encode())
+    except OSError as e:
+        logging.warning("⚠️ Could not cache stock data for %s: %s", stock_id, e)
+
+def flush_alert_buffer_global(alert_manager: AlertBase, alert_buffer: list, max_len: int = 4000):
+    """Send alerts in batches up to `max_len` characters (Telegram caps messages at 4096)."""
     if not alert_buffer:
         logging.info("ℹ️ No alerts to send.")
         return
 
-    current_batch = []
-    current_len = 0
+    # Walk slice bounds instead of building per-batch lists; "\n\n" separators count towards max_len
+    start = 0
+    current_len = len(alert_buffer[0])
 
-    for msg in alert_buffer:
-
-        msg_len = len(msg)
-        if current_len + msg_len > max_len:
-            alert_manager.send("\n\n".join(current_batch))
-            current_batch = [msg]
+    for i in range(1, len(alert_buffer)):
+        msg_len = len(alert_buffer[i])
+        if current_len + 2 + msg_len > max_len:
+            alert_manager.send("\n\n".join(alert_buffer[start:i]))
+            start = i
             current_len = msg_len
         else:
-            current_batch.append(msg)
-            current_len += msg_len
+            current_len += 2 + msg_len
 
-    if current_batch:
-        alert_manager.send("\n\n".join(current_batch))
+    alert_manager.send("\n\n".join(alert_buffer[start:]))
 
     alert_buffer.clear()
 
@@ -60,9 +122,9 @@ class OptionChainScraper:
         use_global_buffer=False,
     ):
         self.stock_id = stock_id
+        self._base_url = f"{self.BASE_URL}{stock_id}"
         self.min_premium = min_premium if min_premium else 4000
         self.alert_manager = alert_manager
-        self.headers = {"User-Agent": "Mozilla/5.0"}
         self.min_oi = min_oi
         self.premium_lot_size = premium_lot_size
         self.use_global_buffer = use_global_buffer
@@ -72,36 +134,104 @@ class OptionChainScraper:
         self.ltp = None
         self.lot_size = None
         self.expiry_dates = []
+        self.prefetched_expiries = {}
         self.alert_buffer = ALERT_BUFFER if use_global_buffer else []
 
-    def fetch_page_json(self, url) -> dict:
-        logging.info(f"🌐 Fetching data for URL: {url}")
+    def fetch_page_payload(self, url) -> Optional[bytes]:
+        """Fetches a page and returns the raw __NEXT_DATA__ JSON bytes."""
+        logging.info("🌐 Fetching data for URL: %s", url)
         try:
-            resp = requests.get(url, headers=self.headers, timeout=15)
+            with REQUEST_SLOTS:
+                resp = SESSION.get(url)
             resp.raise_for_status()
         except Exception as e:
-            logging.error(f"❌ Request failed for {url}: {e}")
-            return {}
+            logging.error("❌ Request failed for %s: %s", url, e)
+            return None
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-        script_tag = soup.find("script", {"id": "__NEXT_DATA__"})
-        if not script_tag:
+        match = NEXT_DATA_RE.search(resp.content)
+        if not match:
             logging.error("❌ Could not find __NEXT_DATA__ script")
-            return {}
-        
-        return json.loads(script_tag.string)
+            return None
+
+        return match.group(1)
+
+    def fetch_page_json(self, url) -> dict:
+        payload = self.fetch_page_payload(url)
+        return _json.loads(payload) if payload else {}
+
+    def option_url(self, expiry: str = None) -> str:
+        """Builds the option chain URL (main or specific expiry)."""
+        return f"{self._base_url}?expiry={expiry}" if expiry else self._base_url
 
-    def fetch_option_json(self, expiry: str = None) -> dict:
+    def fetch_option_json(self, expiry: str = None, use_cache: bool = True) -> dict:
         """Fetches page JSON (main or specific expiry)."""
-        self.url = f"{self.BASE_URL}{self.stock_id}"
-        if expiry:
-            self.url += f"?expiry={expiry}"
+        url = self.option_url(expiry)
+        # The main page and any expiry page supplying LTP are always fetched live
+        if not expiry or not use_cache or PAGE_CACHE_TTL_SECONDS <= 0:
+            return self.fetch_page_json(url)
+
+        path = PAGE_CACHE_DIR / f"{self.stock_id}_{expiry}.json"
+        try:
+            if time.time() - path.stat().st_mtime <= PAGE_CACHE_TTL_SECONDS:
+                logging.info("📦 Using cached data for URL: %s", url)
+                return _json.loads(path.read_bytes())
+        except (OSError, ValueError):
+            pass
+
+        payload = self.fetch_page_payload(url)
+        if not payload:
+            return {}
+
+        try:
+            PAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(payload)
+        except OSError as e:
+            logging.warning("⚠️ Could not cache page for %s: %s", url, e)
+
+        return _json.loads(payload)
+
+    def load_cached_stock_data(self) -> bool:
+        """Load stock name, lot size and upcoming expiries from the disk cache."""
+        meta = load_stock_meta(self.stock_id)
+        if not meta:
+            return False
+
+        try:
+            today = datetime.today().date()
+            self.stock_name = meta["name"]
+            self.lot_size = meta["lot_size"]
+            self.expiry_dates = [e for e in meta["expiry_dates"] if parse_date(e) >= today]
+        except (KeyError, TypeError, ValueError):
+            return False
+
+        logging.info(
+            "✅ Initialized %s from cache | Lot size: %s, Expiries: %s",
+            self.stock_name,
+            self.lot_size,
+            self.expiry_dates,
+        )
+        return bool(self.expiry_dates)
 
-        return self.fetch_page_json(self.url)
+    def load_live_ltp(self) -> bool:
+        """Read LTP from a live fetch of the first expiry page, keeping the page for run()."""
+        expiry = self.expiry_dates[0]
+        data_json = self.fetch_option_json(expiry, use_cache=False)
+        try:
+            self.ltp = data_json["props"]["pageProps"]["data"]["company"]["liveData"]["ltp"]
+        except (KeyError, TypeError):
+            logging.warning("⚠️ Could not read LTP for %s from expiry %s, fetching main page", self.stock_id, expiry)
+            return False
+
+        self.prefetched_expiries[expiry] = data_json
+        return True
 
     def initialize_stock_data(self):
         """Fetch stock details like LTP, lot size, expiry dates."""
-        logging.info(f"🔄 Initializing stock data for {self.stock_id}...")
+        logging.info("🔄 Initializing stock data for %s...", self.stock_id)
+        # On a cache hit LTP comes from the first expiry page; the main page is the fallback
+        if self.load_cached_stock_data() and self.load_live_ltp():
+            return
+
         data_json = self.fetch_option_json()
         if not data_json:
             raise RuntimeError(f"⚠️ Failed to initialize {self.stock_id}, no data returned")
@@ -114,83 +244,97 @@ class OptionChainScraper:
             self.ltp = company_data["liveData"]["ltp"]
             self.lot_size = option_data["aggregatedDetails"]["lotSize"]
             self.expiry_dates = option_data["aggregatedDetails"]["expiryDates"]
+            save_stock_meta(
+                self.stock_id,
+                {"name": self.stock_name, "lot_size": self.lot_size, "expiry_dates": self.expiry_dates},
+            )
 
             logging.info(
-                f"✅ Initialized {self.stock_name} | LTP: {self.ltp}, Lot size: {self.lot_size}, Expiries: {self.expiry_dates}"
+                "✅ Initialized %s | LTP: %s, Lot size: %s, Expiries: %s",
+                self.stock_name,
+                self.ltp,
+                self.lot_size,
+                self.expiry_dates,
             )
         except KeyError as e:
             raise RuntimeError(f"⚠️ Could not parse stock data for {self.stock_id}: Missing {e}")
 
-    def find_closest_strike(self, option_chain, target_price):
-        """Finds the strike closest to a target price using bisect."""
-        strikes = [c["strikePrice"] / 100 for c in option_chain]  # Strikes are multiplied by 100 for some reason
-        pos = bisect_left(strikes, target_price)
-        logging.debug(f"🎯 Target: {target_price}, Closest strike index: {pos}")
+    def find_closest_strike(self, option_chain, target):
+        """Finds the contract whose strike is closest to a target using bisect."""
+        pos = bisect_left(option_chain, target, key=STRIKE_PRICE)
+        logging.debug("🎯 Target: %s, Closest strike index: %s", target, pos)
 
         if pos == 0:
             return option_chain[0]
-        if pos == len(strikes):
+        if pos == len(option_chain):
             return option_chain[-1]
 
         before = option_chain[pos - 1]
         after = option_chain[pos]
-        return (
-            before
-            if abs(before["strikePrice"] / 100 - target_price) <= abs(after["strikePrice"] / 100 - target_price)
-            else after
-        )
+        return before if target - before["strikePrice"] <= after["strikePrice"] - target else after
 
-    def process_expiry(self, expiry_date: str):
-        """Process an expiry and send alerts if premiums cross threshold."""
-        logging.info(f"📅 Processing expiry: {expiry_date}")
-        data_json = self.fetch_option_json(expiry_date)
+    def process_expiry(self, expiry_date: str, data_json: dict):
+        """Process a fetched expiry and buffer alerts; returns True if any premium crossed threshold."""
+        logging.info("📅 Processing expiry: %s", expiry_date)
         if not data_json:
-            logging.warning(f"⚠️ Skipping expiry {expiry_date} for {self.stock_id}, no data returned")
-            return
+            logging.warning("⚠️ Skipping expiry %s for %s, no data returned", expiry_date, self.stock_id)
+            return False
 
+        url = self.option_url(expiry_date)
         option_chain = data_json["props"]["pageProps"]["data"]["optionChain"]["optionContracts"]
 
-        # Targets
-        target_put = 0.905 * self.ltp
-        target_call = 1.095 * self.ltp
+        # Strikes are multiplied by 100 for some reason, so targets are compared in the same scale
+        target_put = round(0.905 * self.ltp * 100)
+        target_call = round(1.095 * self.ltp * 100)
 
         closest_put = self.find_closest_strike(option_chain, target_put)
         closest_call = self.find_closest_strike(option_chain, target_call)
 
         # Extract live data safely
-        put_ltp = closest_put["pe"]["liveData"].get("ltp", 0) if closest_put.get("pe") else 0
-        call_ltp = closest_call["ce"]["liveData"].get("ltp", 0) if closest_call.get("ce") else 0
-
-        put_oi = closest_put["pe"]["liveData"].get("oi", 0) if closest_put.get("pe") else 0
-        call_oi = closest_call["ce"]["liveData"].get("oi", 0) if closest_call.get("ce") else 0
+        pe = closest_put.get("pe") or {}
+        ce = closest_call.get("ce") or {}
+        pe_live = pe.get("liveData") or {}
+        ce_live = ce.get("liveData") or {}
+
+        put_ltp = pe_live.get("ltp", 0)
+        call_ltp = ce_live.get("ltp", 0)
+        put_oi = pe_live.get("oi", 0)
+        call_oi = ce_live.get("oi", 0)
+        put_name = pe.get("longDisplayName", "")
+        call_name = ce.get("longDisplayName", "")
 
         self.premium_lot_size = self.premium_lot_size if self.premium_lot_size else 2 * self.lot_size
         put_premium = self.premium_lot_size * put_ltp
         call_premium = self.premium_lot_size * call_ltp
 
         logging.info(
-            f"{self.stock_name} | Expiry {expiry_date} | "
-            f"PUT {closest_put['pe']['longDisplayName']} → {put_premium} (OI={put_oi}), "
-            f"CALL {closest_call['ce']['longDisplayName']} → {call_premium} (OI={call_oi})"
+            "%s | Expiry %s | PUT %s → %s (OI=%s), CALL %s → %s (OI=%s)",
+            self.stock_name,
+            expiry_date,
+            put_name,
+            put_premium,
+            put_oi,
+            call_name,
+            call_premium,
+            call_oi,
         )
 
         will_alert = False
         # Alerts
         if put_oi > self.min_oi and put_premium > self.min_premium:
-            msg = f"🚨 {self.stock_name} LTP {self.ltp} | Expiry {expiry_date} | {closest_put['pe']['longDisplayName']} | Premium {put_premium} | Lot {self.premium_lot_size} | Price {put_ltp} | OI {put_oi} | {self.url}"
+            msg = f"🚨 {self.stock_name} LTP {self.ltp} | Expiry {expiry_date} | {put_name} | Premium {put_premium} | Lot {self.premium_lot_size} | Price {put_ltp} | OI {put_oi} | {url}"
             self.alert_buffer.append(msg)
             will_alert = True
 
         if call_oi > self.min_oi and call_premium > self.min_premium:
-            msg = f"🚨 {self.stock_name} LTP {self.ltp} | Expiry {expiry_date} | {closest_call['ce']['longDisplayName']} | Premium {call_premium} | Lot {self.premium_lot_size} | Price {call_ltp} | OI {call_oi} | {self.url}"
+            msg = f"🚨 {self.stock_name} LTP {self.ltp} | Expiry {expiry_date} | {call_name} | Premium {call_premium} | Lot {self.premium_lot_size} | Price {call_ltp} | OI {call_oi} | {url}"
             self.alert_buffer.append(msg)
             will_alert = True
 
-        if will_alert:
-            self.process_events()
+        return will_alert
 
     def flush_alerts(self):
-        logging.info(f"🚀 Starting global alert flush.")
+        logging.info("🚀 Starting global alert flush.")
         flush_alert_buffer_global(self.alert_manager, self.alert_buffer)
 
     def run(self):
@@ -204,13 +348,27 @@ class OptionChainScraper:
             self.alert_manager.send(message)
             return
 
-        for expiry in self.expiry_dates:
-            try:
-                self.process_expiry(expiry)
-            except Exception as error:
-                message = f"Exception during process_expiry(): {error}"
-                logging.error(message)
-                expiry_error += message
+        will_alert = False
+        # Expiry pages are independent, so fetch them concurrently and process in order
+        with ThreadPoolExecutor(max_workers=EXPIRY_FETCH_WORKERS) as executor:
+            futures = {
+                expiry: executor.submit(self.fetch_option_json, expiry)
+                for expiry in self.expiry_dates
+                if expiry not in self.prefetched_expiries
+            }
+
+            for expiry in self.expiry_dates:
+                try:
+                    data_json = self.prefetched_expiries.get(expiry) or futures[expiry].result()
+                    will_alert |= self.process_expiry(expiry, data_json)
+                except Exception as error:
+                    message = f"Exception during process_expiry(): {error}"
+                    logging.error(message)
+                    expiry_error += message
+
+        # Corporate actions are per stock, so fetch them once however many expiries alerted
+        if will_alert:
+            self.process_events()
 
         if expiry_error:
             self.alert_manager.send(expiry_error)
@@ -252,6 +410,31 @@ class OptionChainScraper:
             self.alert_buffer.append(message)
 
 
+def _init_worker(log_queue, request_slots):
+    """Send worker logs to the parent's queue and share its request limit."""
+    global REQUEST_SLOTS
+    REQUEST_SLOTS = request_slots
+
+    # Only the parent may write the rotating log file, otherwise workers race on rollover
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+
+def _run_one(tracker, lot_size, min_premium):
+    """Run a scraper for one ticker in a worker process and return its alerts."""
+    logging.info("🚀 Starting scraper for %s", tracker)
+    try:
+        scraper = OptionChainScraper(tracker, TelegramAlert(), lot_size, min_premium, use_global_buffer=True)
+        scraper.run()
+        logging.info("✅ Completed scraper for %s", tracker)
+    finally:
+        # Worker processes are reused across tickers, so hand back and reset this ticker's alerts
+        alerts = list(ALERT_BUFFER)
+        ALERT_BUFFER.clear()
+    return alerts
+
 
 if __name__ == "__main__":
     telegram_alert_obj = TelegramAlert()
@@ -306,21 +489,35 @@ if __name__ == "__main__":
         "power-grid-corporation-of-india-ltd": [],
         "tata-global-beverages-ltd": []
     }
+    log_queue = mp.Queue()
+    pool = mp.Pool(
+        TICKER_POOL_SIZE,
+        initializer=_init_worker,
+        initargs=(log_queue, mp.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)),
+    )
+
+    # Start the listener thread only after the workers are forked; queued records wait until then
+    listener = QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+
+    results = []
     for tracker, qty in trackers_qty.items():
-        logging.info(f"🚀 Starting scraper for {tracker}")
-        if tracker in {"nifty"}:
-            lot_size = qty[0] if len(qty) > 0 else None
-        else:
-            lot_size = None
-
-        if tracker in {"nifty"}:
-            min_premium = qty[1] if len(qty) > 1 else None
-        else:
-            min_premium = None
+        # Only nifty uses its configured lot size / min premium; other tickers use scraper defaults
+        lot_size, min_premium = (qty + [None, None])[:2] if tracker == "nifty" else (None, None)
+        results.append(
+            pool.apply_async(
+                _run_one,
+                args=(tracker, lot_size, min_premium),
+                error_callback=lambda error: logging.error("❌ Scraper failed: %s", error),
+            )
+        )
+    pool.close()
+    pool.join()
+    listener.stop()
 
-        scraper = OptionChainScraper(tracker, telegram_alert_obj, lot_size, min_premium, use_global_buffer=True)
-        scraper.run()
-        logging.info(f"✅ Completed scraper for {tracker}")
+    for result in results:
+        if result.successful():
+            ALERT_BUFFER.extend(result.get())
 
-    logging.info(f"🚀 Starting global alert flush.")
+    logging.info("🚀 Starting global alert flush.")
     flush_alert_buffer_global(telegram_alert_obj, ALERT_BUFFER)
@@ -17,16 +17,17 @@ class TelegramAlert(AlertBase):
     def __init__(self, bot_token = None, chat_id = None):
         self.bot_token = bot_token if bot_token else os.getenv("TELEGRAM_BOT_TOKEN")
         self.chat_id = chat_id if chat_id else os.getenv("TELEGRAM_CHAT_ID")
+        self._session = requests.Session()
 
     def send(self, message):
         url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-        payload = {"chat_id": self.chat_id, "text": message, "parse_mode": "Markdown"}
+        payload = {"chat_id": self.chat_id, "text": message, "disable_web_page_preview": True}
         try:
-            res = requests.post(url, data=payload)
+            res = self._session.post(url, data=payload)
             if res.status_code != 200:
-                logger.error(f"Alert failed: {res.text}")
+                logger.error("Alert failed: %s", res.text)
             else:
-                logger.debug(f"Alert sent successfully to chat_id: {self.chat_id}")
+                logger.debug("Alert sent successfully to chat_id: %s", self.chat_id)
         except Exception as e:
-            logger.error(f"Alert error: {e}")
+            logger.error("Alert error: %s", e)
 
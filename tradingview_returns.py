@@ -14,13 +14,14 @@ TRADINGVIEW_SYMBOLS = [
 ]
 
 USER_AGENT = {"User-Agent": "Mozilla/5.0"}
+SYMBOL_SCREENER_RE = re.compile(rb'"symbol_screener_data":(\{.*?\}),"nearest_futures_contracts"', re.S)
 
 
 setup_logging("tradingview_returns")
 
 
-def _extract_symbol_change(page_html: str):
-    match = re.search(r'"symbol_screener_data":(\{.*?\}),"nearest_futures_contracts"', page_html, re.S)
+def _extract_symbol_change(page_content: bytes):
+    match = SYMBOL_SCREENER_RE.search(page_content)
     if not match:
         return None
 
@@ -40,9 +41,9 @@ def get_tradingview_returns_summary() -> str:
         try:
             response = requests.get(url, headers=USER_AGENT, timeout=15)
             response.raise_for_status()
-            change = _extract_symbol_change(response.text)
+            change = _extract_symbol_change(response.content)
         except Exception as error:
-            logging.warning(f"Failed to fetch TradingView return for {label}: {error}")
+            logging.warning("Failed to fetch TradingView return for %s: %s", label, error)
             change = None
 
         if change is None: